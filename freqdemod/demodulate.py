@@ -53,11 +53,13 @@ from __future__ import division, print_function, absolute_import
 import h5py
 import numpy as np 
 import scipy as sp 
+from scipy import fft as spfft
 import math
 import time
+import functools
 import datetime
 import warnings
-from lmfit import minimize, Parameters, fit_report
+from scipy import optimize
 from freqdemod.hdf5 import update_attrs
 from freqdemod.hdf5 import check_minimum_attrs
 from freqdemod.hdf5 import infer_missing_attrs
@@ -66,13 +68,59 @@ from freqdemod.hdf5.hdf5_util import save_hdf5, h5ls
 print_hdf5_item_structure = h5ls  # Alias for backward compatibility
 from freqdemod.util import timestamp_temp_filename
 from freqdemod.util import infer_timestep
+from freqdemod.util import nearest_fast_len
+from freqdemod.util import unwrap
 from collections import OrderedDict
 import six
-import matplotlib.pyplot as plt 
+
+# matplotlib is imported by the plotting methods when they are first called,
+# so that the workup does not pay for importing it
+
+# If pyFFTW is installed, compute the FFTs with FFTW.  Plans are cached, so
+# repeated transforms of the same length and dtype (e.g., many Signal objects
+# of the same size) reuse the plan.  Otherwise use scipy.fft.
+#
+# Plan with FFTW_ESTIMATE: FFTW_MEASURE times candidate plans on the first
+# transform of each length, which for 2^20 points takes tens of seconds --
+# far longer than all the transforms a workup does.
+
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft
+
+    pyfftw.interfaces.cache.enable()
+    pyfftw.interfaces.cache.set_keepalive_time(60)
+
+    _fft_lib = pyfftw.interfaces.scipy_fft
+    _fft_kwargs = {'planner_effort': 'FFTW_ESTIMATE'}
+
+except ImportError:
+
+    _fft_lib = spfft
+    _fft_kwargs = {}
+
+# The last few bandpass filters made by freq_filter_bp, keyed by the filter
+# parameters and the frequency grid.  A batch of signals of the same length
+# worked up with the same filter reuses the filter instead of rebuilding it.
+# The cached arrays are read-only.
+
+_bp_cache = OrderedDict()
+_BP_CACHE_SIZE = 4
+
+# Datasets smaller than this are not worth chunking and compressing on disk
+
+_COMPRESS_MIN_BYTES = 64*1024
+
+# The (real, complex) dtypes of the filters and the inverse-transform results
+# for each Signal precision
+
+_PRECISION_DTYPES = {'float64': (np.float64, np.complex128),
+                     'float32': (np.float32, np.complex64)}
 
 class Signal(object):
 
-    def __init__(self, filename=None, mode='w-', driver='core', backing_store=False):
+    def __init__(self, filename=None, mode='w-', driver='core', backing_store=False,
+                 precision='float64'):
         """
         Initialize the *Signal's* hdf5 data structure. Calling with no arguments
         results in an in-memory only object. To save the data to disk, provide
@@ -83,6 +131,11 @@ class Signal(object):
         :param str mode: file open mode (see h5py.File)
         :param str driver: hdf5 driver (see h5py.File)
         :param bool backing_store: If True, save the file to disk.
+        :param str precision: 'float64' (default) or 'float32', the precision
+            of the Hc and bp filters, the inverse Fourier transform, and the 
+            complex signal z and amplitude a computed from it; with 
+            'float32', a single-precision signal is also Fourier transformed
+            in single precision
         
         Add the following objects to the *Signal* object
         
@@ -97,6 +150,10 @@ class Signal(object):
             s = Signal('not-saved.h5')                        # Still in-memory only
             s = Signal('save-to-disk.h5', backing_store=True) # Save to disk
         """
+        if precision not in _PRECISION_DTYPES:
+            raise ValueError("precision must be 'float64' or 'float32'")
+        
+        self.precision = precision
         new_report = []
                 
         if filename is not None:
@@ -136,6 +193,8 @@ class Signal(object):
         self.report = []
         self.report.append(" ".join(new_report))
 
+        self._signal_attrs = None
+
     def load_nparray(self, s, s_name, s_unit, dt, s_help='cantilever displacement'):
 
         """
@@ -157,7 +216,7 @@ class Signal(object):
         """
         s = np.atleast_1d(s)
 
-        self.f['x'] = dt * np.arange(s.size)
+        self._create_dataset('x', dt * np.arange(s.size))
         attrs = OrderedDict([
             ('name','t'),
             ('unit','s'),
@@ -169,7 +228,7 @@ class Signal(object):
             ])
         update_attrs(self.f['x'].attrs, attrs)
         
-        self.f['y'] = s
+        self._create_dataset('y', s)
         attrs = OrderedDict([
             ('name',s_name),
             ('unit',s_unit),
@@ -180,12 +239,13 @@ class Signal(object):
             ('n_avg',1)
             ])
         update_attrs(self.f['y'].attrs, attrs)   
+        self._cache_signal_attrs()
         
         new_report = []
         new_report.append("Add a signal {0}[{1}]".format(s_name,s_unit))
-        new_report.append("of length {0},".format(np.array(s).size))
+        new_report.append("of length {0},".format(s.size))
         new_report.append("time step {0:.3f} us,".format(1E6*dt))
-        new_report.append("and duration {0:.3f} s".format(np.array(s).size*dt))
+        new_report.append("and duration {0:.3f} s".format(s.size*dt))
         
         self.report.append(" ".join(new_report))
 
@@ -311,6 +371,8 @@ class Signal(object):
         self.f = h5py.File(filename, 'r+')
         self.report = self.f.attrs['report'].split("\n")
 
+        self._signal_attrs = None
+
     def plot(self, ordinate, LaTeX=False, component='abs'):
         
         """ 
@@ -328,6 +390,8 @@ class Signal(object):
         
         """
 
+        import matplotlib.pyplot as plt
+
         # Get the x and y axis. 
 
         y = self.f[ordinate]
@@ -353,8 +417,8 @@ class Signal(object):
         title_string = "{0} vs. {1}".format(y.attrs['help'],x.attrs['help'])
 
         # Create the plot. If the y-axis is complex, then
-        # plot the abs() of it. To use the abs() method, we need to force the 
-        # HDF5 dataset to be of type np.ndarray 
+        # plot the abs() of it.  Read the HDF5 datasets into np.ndarrays
+        # once, up front, and reuse them below.
         
         # fig=plt.figure(facecolor='w')
 
@@ -364,38 +428,46 @@ class Signal(object):
                                 sharey=True,
                                 tight_layout=True)
 
-        if isinstance(y[0],complex):
+        x_np = x[()]
+        y_np = y[()]
+
+        # Check the dataset's type from its metadata; no HDF5 read needed
+
+        is_complex = y.dtype.kind == 'c'
+        is_bool = y.dtype.kind == 'b'
+
+        if is_complex:
             
             if component == 'abs':
-                axs[0].plot(x[()], abs(np.array(y[()])))
-                yhist = abs(np.array(y[()]))
+                yhist = np.abs(y_np)
+                axs[0].plot(x_np, yhist)
                 y_label_string = "abs of {}".format(y_label_string)
                 
             if component == 'real':
-                axs[0].plot(x[()], (np.array(y[()])).real)
-                yhist = (np.array(y[()])).real
+                yhist = y_np.real
+                axs[0].plot(x_np, yhist)
                 y_label_string = "real part of {}".format(y_label_string) 
                 
             if component == 'imag':
-                axs[0].plot(x[()], (np.array(y[()])).imag)
-                yhist = (np.array(y[()])).imag
+                yhist = y_np.imag
+                axs[0].plot(x_np, yhist)
                 y_label_string = "imag part of {}".format(y_label_string)
                 
             if component == 'both':
-                axs[0].plot(x[()], (np.array(y[()])).real)
-                axs[0].plot(x[()], (np.array(y[()])).imag)
-                yhist = (np.array(y[()])).real # just histogram the real part, for simplicity
+                axs[0].plot(x_np, y_np.real)
+                axs[0].plot(x_np, y_np.imag)
+                yhist = y_np.real # just histogram the real part, for simplicity
                 y_label_string = "real and imag part of {}".format(y_label_string)                
                     
         else:
 
-            if isinstance(y[0], (np.bool_, bool)):
-                axs[0].plot(x[()], y[()])
-                yhist = y[()].astype(int)
+            if is_bool:
+                axs[0].plot(x_np, y_np)
+                yhist = y_np.astype(int)
 
             else:
-                axs[0].plot(x[()], y[()])
-                yhist = y[()]
+                axs[0].plot(x_np, y_np)
+                yhist = y_np
          
         # axes limits and labels
         
@@ -408,12 +480,18 @@ class Signal(object):
         # create a sideways histogram plot with a text
         # message of the mean and stdev
 
-        counts, _ = np.histogram(yhist, bins=256)
-        axs[1].hist(yhist, bins=256, orientation="horizontal")   
+        counts, _, _ = axs[1].hist(yhist, bins=256, orientation="horizontal")   
         axs[1].set_xlabel('counts')
 
-        msg1 = '{:0.3f} {:}'.format(yhist.mean(), y.attrs['unit'])
-        msg2 = '{:0.3f} {:}'.format(yhist.std(), y.attrs['unit'])
+        # mean and standard deviation; compute the sum of squared deviations
+        # as a (BLAS) dot product instead of letting std() redo the mean
+
+        y_mean = float(yhist.mean())
+        y_dev = yhist - y_mean
+        y_std = float(np.sqrt(np.dot(y_dev, y_dev)/yhist.size))
+
+        msg1 = '{:0.3f} {:}'.format(y_mean, y.attrs['unit'])
+        msg2 = '{:0.3f} {:}'.format(y_std, y.attrs['unit'])
 
         axs[1].text(0.90*counts.max(), 1.00*yhist.max(),
                     msg1 + '\n $\pm$ ' + msg2, 
@@ -433,7 +511,7 @@ class Signal(object):
         plt.show()
         plt.rcParams['text.usetex'] = old_param  
         
-    def time_mask_binarate(self, mode):
+    def time_mask_binarate(self, mode, fast=False):
  
         """
         Create a masking array of ``True``/``False`` values that can be used to
@@ -441,6 +519,9 @@ class Signal(object):
         to perform a Fast Fourier Transform.  
          
         :param str mode: "start", "middle", or "end" 
+        :param bool fast: if ``True``, truncate the array instead to the
+            nearest length of the form :math:`2^a 3^b 5^c`.  The FFT is
+            just as fast for these lengths, and far fewer points are discarded.
         
         With "start", the beginning of the array will be left intact and the 
         end truncated; with "middle", the array will be shortened
@@ -456,12 +537,19 @@ class Signal(object):
         0 by the ``matplotlib`` plotting function.
         """       
         
-        n = self.f['y'].size     # number of points, n, in the signal
-        indices = np.arange(n)   # np.array of indices
+        n = self.n               # number of points, n, in the signal
 
-        # nearest power of 2 to n
-        n2 = int(math.pow(2,int(math.floor(math.log(n, 2)))))
-        
+        if fast == True:
+
+            # nearest 5-smooth number to n
+            n2 = nearest_fast_len(n)
+            length_help = 'a fast FFT length'
+
+        else:
+
+            # nearest power of 2 to n
+            n2 = int(math.pow(2,int(math.floor(math.log(n, 2)))))
+            length_help = 'a power of two'
         
         if mode == "middle":
 
@@ -478,23 +566,31 @@ class Signal(object):
             n_start = n-n2
             n_stop = n            
                                     
-        mask = (indices >= n_start) & (indices < n_stop)
+        # The kept points are one contiguous run, so set them with a slice
+        
+        mask = np.zeros(n, dtype=bool)
+        mask[n_start:n_stop] = True
         
-        dset = self.f.create_dataset('workup/time/mask/binarate',data=mask)            
+        dset = self._create_dataset('workup/time/mask/binarate',mask)            
         attrs = OrderedDict([
             ('name','mask'),
             ('unit','unitless'),
             ('label','masking function'),
             ('label_latex','masking function'),
-            ('help','mask to make data a power of two in length'),
-            ('abscissa','x')
+            ('help','mask to make data {0} in length'.format(length_help)),
+            ('abscissa','x'),
+            ('n_start',n_start),
+            ('n_stop',n_stop),
+            ('n_full',n)
             ])
         update_attrs(dset.attrs,attrs)      
                            
-        x = self.f['x']
-        x_binarated = x[mask] 
+        # The kept points are contiguous, so read the time axis as a slab
+        # rather than indexing the HDF5 dataset with the boolean mask
+
+        x_binarated = self.f['x'][n_start:n_stop]
             
-        dset = self.f.create_dataset('workup/time/x_binarated',data=x_binarated)            
+        dset = self._create_dataset('workup/time/x_binarated',x_binarated)            
         attrs = OrderedDict([
             ('name','t_masked'),
             ('unit','s'),
@@ -509,7 +605,7 @@ class Signal(object):
         new_report = []
         new_report.append("Make an array, workup/time/mask/binarate, to be used")
         new_report.append("to truncate the signal to be {0}".format(n2))
-        new_report.append("points long (a power of two). The truncated array")
+        new_report.append("points long ({0}). The truncated array".format(length_help))
         new_report.append("will start at point {0}".format(n_start))
         new_report.append("and stop before point {0}.".format(n_stop))
         
@@ -548,28 +644,30 @@ class Signal(object):
         
         if self.f.__contains__('workup/time/mask/binarate') == True:
             
-            # You have to cast the HSF5 dataset to a np.array
-            # so you can use the array of True/False values as 
-            # array indices
+            # The number of points kept by the mask is the length of
+            # the binarated time axis; no need to read the mask itself
             
-            m = np.array(self.f['workup/time/mask/binarate'])        
-            n = np.count_nonzero(m)
+            n = self.f['workup/time/x_binarated'].size
             abscissa = 'workup/time/x_binarated'  
             
         else:
             
-            n = self.f['y'].size
+            n = self.n
             abscissa = 'x'
             
-        dt = self.f['x'].attrs['step']          # time per point
+        dt = self.dt          # time per point
         ww = int(math.ceil((1.0*tw)/(1.0*dt)))  # window width (points)
         tw_actual = ww*dt                       # actual window width (seconds)
 
-        w = np.concatenate([np.blackman(2*ww)[0:ww],
-                            np.ones(n-2*ww),
-                            np.blackman(2*ww)[-ww:]])
+        # Fill the window in place; the blackman ramps are computed once
+        
+        bl = np.blackman(2*ww)
+        w = np.empty(n)
+        w[:ww] = bl[:ww]
+        w[ww:n-ww] = 1.0
+        w[n-ww:] = bl[ww:]
 
-        dset = self.f.create_dataset('workup/time/window/cyclicize',data=w)            
+        dset = self._create_dataset('workup/time/window/cyclicize',w)            
         attrs = OrderedDict([
             ('name','window'),
             ('unit','unitless'),
@@ -578,7 +676,8 @@ class Signal(object):
             ('help','window to force the data to start and end at zero'),
             ('abscissa',abscissa),
             ('t_window',tw),
-            ('t_window_actual',tw_actual)
+            ('t_window_actual',tw_actual),
+            ('ww',ww)
             ])
         update_attrs(dset.attrs,attrs)
         
@@ -603,34 +702,36 @@ class Signal(object):
          
         start = time.time()         
         
-        # If a mask is defined then select out a subset of the signal to be FT'ed
-        # The signal array, s, should be a factor of two in length at this point        
-           
-        s = np.array(self.f['y'])   
-
-        if self.f.__contains__('workup/time/mask/binarate') == True:
-            
-            m = np.array(self.f['workup/time/mask/binarate'])
-            s = s[m]
-
-        # If the cyclicizing window is defined then apply it to the signal                
-                                                      
-        if self.f.__contains__('workup/time/window/cyclicize') == True:
-            
-            w = np.array(self.f['workup/time/window/cyclicize'])
-            s = w*s
+        s = self._windowed_signal()
+        n = s.size
           
-        # Take the Fourier transform      
+        # Take the Fourier transform
                     
-        dt = self.f['x'].attrs['step']
-          
-        freq = np.fft.fftshift(np.fft.fftfreq(s.size,dt))   
+        dt = self.dt
 
         name_orig = self.f['y'].attrs['name']
-        unit_orig = self.f['y'].attrs['unit']
+        unit_orig = self._unit_y
 
-        if psd == False:                
-            sFT = dt * np.fft.fftshift(np.fft.fft(s))
+        if psd == False:
+            freq = spfft.fftshift(spfft.fftfreq(n, dt))
+
+            if np.iscomplexobj(s):
+                sFT = dt * spfft.fftshift(_fft_lib.fft(s, workers=-1, overwrite_x=True, **_fft_kwargs))
+
+            else:
+
+                # A real signal has a conjugate-symmetric FT, so take the
+                # (twice as fast) real FFT and fill in the negative
+                # frequencies by symmetry, writing straight into the
+                # shifted layout: sFT[h+j] = F[j], sFT[h-j] = conj(F[j])
+
+                F = _fft_lib.rfft(s, workers=-1, **_fft_kwargs)
+                F *= dt
+
+                h = n//2
+                sFT = np.empty(n, F.dtype)
+                sFT[h:] = F[:n-h]
+                np.conjugate(F[h:0:-1], out=sFT[:h])
 
             sFTunit = '{0}/Hz'.format(unit_orig)
             sFTlabel = 'FT({0}) [{1}]'.format(name_orig,sFTunit)
@@ -638,21 +739,35 @@ class Signal(object):
             sFThelp = 'Fourier transform of {0}(t)'.format(name_orig)
 
         elif psd == True:
-            sFT = (dt / len(s)) * np.power(abs(np.fft.fftshift(np.fft.fft(s))), 2.0)
+
+            # single-sided power spectrum: keep the points with 
+            # 0 <= f < f_Nyquist, the f >= 0 half of the shifted spectrum.
+            # These are the first n_pos points of the unshifted transform; 
+            # for a real signal, rfft gives them directly.
+
+            # |F|^2 = re^2 + im^2, computed in place, avoids the sqrt in abs()
+            # and the slow np.power()
+
+            n_pos = (n + 1)//2
+            freq = spfft.rfftfreq(n, dt)[:n_pos]
+
+            if np.iscomplexobj(s):
+                F = _fft_lib.fft(s, workers=-1, overwrite_x=True, **_fft_kwargs)[:n_pos]
+            else:
+                F = _fft_lib.rfft(s, workers=-1, **_fft_kwargs)[:n_pos]
+
+            sFT = np.square(F.real)
+            sFT += np.square(F.imag)
+            sFT *= dt / n
 
             sFTunit = '{0}^2/Hz'.format(unit_orig)
             sFTlabel = 'PSD({0}) [{1}^2/Hz]'.format(name_orig,unit_orig)
             sFTlabel_latex = '$P_{{{0}}} \: [\mathrm{{{1}}}^2/\mathrm{{Hz}}]$'.format(name_orig,unit_orig)
             sFThelp = 'Power spectrum of {0}(t)'.format(name_orig)
 
-            # single-sided power s
-            mask = freq >= 0
-            freq = freq[mask]
-            sFT = sFT[mask]
-
         # Save the data
         
-        dset = self.f.create_dataset('workup/freq/freq',data=freq/1E3)
+        dset = self._create_dataset('workup/freq/freq',freq/1E3)
         attrs = OrderedDict([
             ('name','f'),
             ('unit','kHz'),
@@ -664,7 +779,7 @@ class Signal(object):
             ])          
         update_attrs(dset.attrs,attrs)        
 
-        dset = self.f.create_dataset('workup/freq/FT',data=sFT)
+        dset = self._create_dataset('workup/freq/FT',sFT)
         attrs = OrderedDict([
             ('name','FT({0})'.format(name_orig)),
             ('unit',sFTunit),
@@ -710,10 +825,15 @@ class Signal(object):
         
         """
         
-        freq = self.f['workup/freq/freq'][:]
-        filt = 0.0*(freq < 0) + 1.0*(freq == 0) + 2.0*(freq > 0)
+        # sign(f) + 1 is 0, 1, 2 for f < 0, f = 0, f > 0, in a single pass
+
+        dset = self.f['workup/freq/freq']
+        freq = np.empty(dset.shape)
+        dset.read_direct(freq)
+        filt = np.sign(freq, out=np.empty(freq.shape, self._dtypes()[0]))
+        filt += 1.0
         
-        dset = self.f.create_dataset('workup/freq/filter/Hc',data=filt)            
+        dset = self._create_dataset('workup/freq/filter/Hc',filt)            
         attrs = OrderedDict([
             ('name','Hc'),
             ('unit','unitless'),
@@ -782,39 +902,29 @@ class Signal(object):
                                 
         """
         
-        # The center frequency fc is the peak in the abs of the FT spectrum
+        # The center frequency fc is the positive-frequency peak in the abs
+        # of the FT spectrum.  The frequencies are sorted, so the positive
+        # ones are the slab starting at i0, in either the two-sided spectrum
+        # or a single-sided one (e.g., a power spectrum).  Read only that slab.
         
-        freq = np.array(self.f['workup/freq/freq'][:])
-        Hc = np.array(self.f['workup/freq/filter/Hc'][:])
-        FTrh = Hc*abs(np.array(self.f['workup/freq/FT'][:]))
-        fc = freq[np.argmax(FTrh)]
-        
-        # Compute the filter
-                        
-        freq_scaled = (freq - fc)/bw
-
-        if style == "brick wall":
-
-            bp = 1.0/(1.0+np.power(abs(freq_scaled),order))
-
-        elif style == "cosine":
+        dset = self.f['workup/freq/freq']
+        freq = np.empty(dset.shape)
+        dset.read_direct(freq)
+        i0 = int(np.searchsorted(freq, 0.0, side='right'))
 
-            # here we use a trick
-
-            bp = np.zeros(freq.shape)
-            sub_index = (freq >= -1.0*bw + fc) & (freq <= bw + fc)
-            sub_indices = np.arange(freq.size)[sub_index]
-            bp[sub_indices] = np.sin(np.linspace(0,np.pi,sub_indices.size))
-
-        elif style == "gaussian":
-
-            bp = np.exp(-1 * np.power(freq_scaled, 2.0))
-
-        else:
-
-            print("**ERROR**: Unrecognized filter function")
+        dset = self.f['workup/freq/FT']
+        FT_pos = np.empty(dset.size - i0, dset.dtype)
+        dset.read_direct(FT_pos, source_sel=np.s_[i0:])
+        FT_abs = np.abs(FT_pos)
+        fc = freq[i0 + np.argmax(FT_abs)]
+        
+        # Compute the filter, unless the same filter on the same frequency
+        # grid was computed recently
+        
+        bp = self._bandpass(freq, fc, bw, order, style)
 
-        dset = self.f.create_dataset('workup/freq/filter/bp',data=bp)            
+        dset = self._create_dataset('workup/freq/filter/bp',
+                                    bp.astype(self._dtypes()[0], copy=False))
         attrs = OrderedDict([
             ('name','bp'),
             ('unit','unitless'),
@@ -829,8 +939,10 @@ class Signal(object):
         #  using the method of moments -- this only gives the right answer
         #  because we have applied the nice bandpass filter first
         
-        FT_filt = Hc*bp*abs(self.f['workup/freq/FT'][:])
-        fc_improved = (freq*FT_filt).sum()/FT_filt.sum()
+        FT_filt = np.multiply(bp[i0:], FT_abs, out=FT_abs)
+        FT_filt_sum = FT_filt.sum()
+        FT_filt *= freq[i0:]
+        fc_improved = FT_filt.sum()/FT_filt_sum
         
         new_report = []
         new_report.append("Create a bandpass filter with center frequency")
@@ -842,6 +954,85 @@ class Signal(object):
                 
         self.report.append(" ".join(new_report))
         
+    def _bandpass(self, freq, fc, bw, order, style):
+        """The bandpass filter of freq_filter_bp on the frequency grid freq
+        [kHz], centered at fc [kHz], or None if the style is not recognized.
+        The filter is a read-only array, which is shared with later calls for
+        the same filter on the same grid."""
+
+        key = (style, bw, fc, order, freq.size, freq[0], freq[-1])
+        bp = _bp_cache.pop(key, None)
+
+        if bp is None:
+
+            bp = self._bandpass_new(freq, fc, bw, order, style)
+
+            if bp is not None:
+                bp.setflags(write=False)
+
+        if bp is not None:
+
+            _bp_cache[key] = bp     # (re)insert as the most recently used
+            while len(_bp_cache) > _BP_CACHE_SIZE:
+                _bp_cache.popitem(last=False)
+
+        return bp
+
+    def _bandpass_new(self, freq, fc, bw, order, style):
+        """Compute the filter returned by ``_bandpass``, as a new array."""
+
+        freq_scaled = np.subtract(freq, fc)
+        freq_scaled /= bw
+
+        if style == "brick wall":
+
+            # Outside |f - f_0|/bw > eps^(-1/n) the filter is below double
+            # precision round-off, so leave it zero there and only evaluate
+            # |x|^n inside the band.  This also avoids overflow in the power.
+            # For n <= 0 the filter does not fall off, so evaluate it 
+            # everywhere.
+
+            af = np.abs(freq_scaled, out=freq_scaled)
+
+            if order > 0:
+
+                near = np.less(af, np.finfo(float).eps**(-1.0/order))
+                bp = np.zeros(freq.shape)
+
+                p = np.power(af[near],order)
+                p += 1.0
+                bp[near] = np.reciprocal(p, out=p)
+
+            else:
+
+                bp = np.power(af,order)
+                bp += 1.0
+                np.reciprocal(bp, out=bp)
+
+        elif style == "cosine":
+
+            # here we use a trick
+
+            bp = np.zeros(freq.shape)
+            sub_index = (freq >= -1.0*bw + fc) & (freq <= bw + fc)
+            n_sub = np.count_nonzero(sub_index)
+            bp[sub_index] = np.sin(np.linspace(0,np.pi,n_sub))
+
+        elif style == "gaussian":
+
+            # exp(-x^2), one new array and the rest in place
+
+            bp = np.square(freq_scaled)
+            np.negative(bp, out=bp)
+            np.exp(bp, out=bp)
+
+        else:
+
+            print("**ERROR**: Unrecognized filter function")
+            bp = None
+
+        return bp
+
     def time_mask_rippleless(self, td): 
         
         """
@@ -895,35 +1086,37 @@ class Signal(object):
         
         """        
 
-        dt = self.f['x'].attrs['step']          # time per point
+        dt = self.dt          # time per point
         ww = int(math.ceil((1.0*td)/(1.0*dt)))  # window width (points)
         td_actual = ww*dt                       # actual dead time (seconds)        
            
         if self.f.__contains__('workup/time/mask/binarate') == True:
-            x = np.array(self.f['/workup/time/x_binarated'][:])
             abscissa = '/workup/time/x_binarated'
 
         else:
-            x = np.array(self.f['x'][:])
             abscissa = 'x'
+
+        # Only the middle slab of the time axis is kept, so read just that
             
-        n = x.size
-        indices = np.arange(n)
-        mask = (indices >= ww) & (indices < n - ww)
-        x_rippleless = x[mask]
+        n = self.f[abscissa].size
+        mask = np.zeros(n, dtype=bool)
+        mask[ww:n-ww] = True
+        x_rippleless = self.f[abscissa][ww:n-ww]
         
-        dset = self.f.create_dataset('workup/time/mask/rippleless',data=mask)            
+        dset = self._create_dataset('workup/time/mask/rippleless',mask)            
         attrs = OrderedDict([
             ('name','mask'),
             ('unit','unitless'),
             ('label','masking function'),
             ('label_latex','masking function'),
             ('help','mask to remove leading and trailing ripple'),
-            ('abscissa',abscissa)
+            ('abscissa',abscissa),
+            ('ww',ww),
+            ('n_full',n)
             ])
         update_attrs(dset.attrs,attrs)
         
-        dset = self.f.create_dataset('workup/time/x_rippleless',data=x_rippleless)            
+        dset = self._create_dataset('workup/time/x_rippleless',x_rippleless)            
         attrs = OrderedDict([
             ('name','t_masked'),
             ('unit','s'),
@@ -964,75 +1157,138 @@ class Signal(object):
         # digital Fourier transformed data.  Carry out the 
         # transforms.
         
-        s = self.f['workup/freq/FT'][:]/self.f['x'].attrs['step']
+        dt = self.dt
 
-        if self.f.__contains__('workup/freq/filter/Hc') == True:
-            s = s*self.f['workup/freq/filter/Hc']            
-                                    
-        if self.f.__contains__('workup/freq/filter/bp') == True:
-            s = s*self.f['workup/freq/filter/bp']
+        # Multiply the (real) filters together first, and fold the 1/dt into
+        # them, so that the complex spectrum is multiplied only once, in place.
+
+        filt = None
+
+        for name in ['workup/freq/filter/Hc', 'workup/freq/filter/bp']:
+            if self.f.__contains__(name) == True:
+                if filt is None:
+                    filt = self.f[name][:]
+                else:
+                    filt *= self.f[name][:]
+
+        if filt is not None:
+            filt /= dt
+
+        # The spectrum is stored fftshift-ed.  Read it straight into the
+        # unshifted order the IFT wants, ifftshift(s)[k] = s[(k + n//2) % n],
+        # as two slabs, rather than reading it and then shifting a copy.
+
+        FT = self.f['workup/freq/FT']
+        n = FT.size
+        h = n//2
+
+        s = np.empty(n, self._dtypes()[1])
+        FT.read_direct(s, source_sel=np.s_[h:], dest_sel=np.s_[:n-h])
+        FT.read_direct(s, source_sel=np.s_[:h], dest_sel=np.s_[n-h:])
+
+        if filt is not None:
+            s[:n-h] *= filt[h:]
+            s[n-h:] *= filt[:h]
+        else:
+            s /= dt
             
-        # Compute the IFT    
+        # Compute the IFT with the same (multi-threaded) FFT library as fft();
+        # s is a temporary, so the library may overwrite it.  In single
+        # precision, s is complex64 and so is the transform.
             
-        sIFT = np.fft.ifft(np.fft.ifftshift(s))
+        sIFT = _fft_lib.ifft(s, workers=-1, overwrite_x=True, **_fft_kwargs)
         
-        # Trim if a rippleless masking array is defined
-        # Carefullly define what we should plot the complex
-        # FT-ed data against.
+        self._save_analytic(sIFT)
+          
+        new_report = []
+        new_report.append("Apply an inverse Fourier transform.")
+        self.report.append(" ".join(new_report))
         
-        if self.f.__contains__('workup/time/mask/rippleless') == True:
-            
-            mask = np.array(self.f['workup/time/mask/rippleless'])
-            sIFT = sIFT[mask]
-            abscissa = 'workup/time/x_rippleless'
+    def analytic_fast(self, bw=None, order=50, style="brick wall", fc=None):
+        
+        """
+        Compute the complex cantilever displacement, phase, and amplitude
+        directly from the (masked and windowed) signal.  The result is the 
+        same as from
+        
+        * fft,
+        
+        * freq_filter_Hilbert_complex,
+        
+        * freq_filter_bp (if **bw** is given),
+        
+        * ifft,
+        
+        but the Fourier transform and the filters are kept in memory rather 
+        than stored in the file, and the transform of a real signal is 
+        computed only at the non-negative frequencies, which are all that the
+        complex Hilbert transform filter keeps.  (A complex signal takes a
+        full complex transform.)  This is the faster route when only the 
+        time-domain results are wanted.
+        
+        :param float bw: bandpass filter bandwidth [kHz]; if ``None``
+            (default), no bandpass filter is applied
+        :param int order: filter order (defaults to 50)
+        :param string style: "brick wall" (default) or "cosine or "gaussian"
+        :param float fc: filter center frequency [kHz]; if ``None`` (default),
+            use the positive-frequency peak in the signal's Fourier transform
             
+        As with ifft, the result is trimmed if workup/time/mask/rippleless is
+        defined.  Store the results in::
+        
+            workup/time/z
+            workup/time/p
+            workup/time/a
+        """
+        
+        s = self._windowed_signal()
+        n = s.size
+        dt = self.dt
+        
+        # The transform at 0 <= f < f_Nyquist, the points where fft() and 
+        # freq_filter_Hilbert_complex() give a nonzero Hc, times Hc (1 at 
+        # f = 0, 2 at f > 0).  These are the first n_pos points of the 
+        # unshifted transform, real or complex.
+        
+        n_pos = (n + 1)//2
+        freq = spfft.rfftfreq(n, dt)[:n_pos]/1E3
+        
+        if np.iscomplexobj(s):
+            F = _fft_lib.fft(s, workers=-1, overwrite_x=True, **_fft_kwargs)[:n_pos]
         else:
-            
-            if self.f.__contains__('workup/time/mask/binarate') == True:
-                abscissa = '/workup/time/x_binarated'
-            else:
-                abscissa = 'x'
+            F = _fft_lib.rfft(s, workers=-1, **_fft_kwargs)[:n_pos]
         
-        dset = self.f.create_dataset('workup/time/z',data=sIFT)
-        unit_y = self.f['y'].attrs['unit']
-        attrs = OrderedDict([
-            ('name','z'),
-            ('unit',unit_y),
-            ('label','z [{0}]'.format(unit_y)),
-            ('label_latex','$z \: [\mathrm{{{0}}}]$'.format(unit_y)),
-            ('help','complex cantilever displacement'),
-            ('abscissa',abscissa)
-            ])
-        update_attrs(dset.attrs,attrs)         
-
-        # Compute and save the phase and amplitude
+        F[1:] *= 2.0
         
-        p = np.unwrap(np.angle(sIFT))/(2*np.pi)
-        dset = self.f.create_dataset('workup/time/p',data=p)
-        attrs = OrderedDict([
-            ('name','phase'),
-            ('unit','cyc'),
-            ('label','phase [cyc]'),
-            ('label_latex','$\phi \: [\mathrm{cyc}]$'),
-            ('help','cantilever phase'),
-            ('abscissa',abscissa)
-            ])
-        update_attrs(dset.attrs,attrs)
-                  
-        a = abs(sIFT)
-        dset = self.f.create_dataset('workup/time/a',data=a)
-        attrs = OrderedDict([
-            ('name','amplitude'),
-            ('unit',unit_y),
-            ('label','a [{0}]'.format(unit_y)),
-            ('label_latex','$a \: [\mathrm{{{0}}}]$'.format(unit_y)),
-            ('help','cantilever amplitude'),
-            ('abscissa',abscissa)
-            ])
-        update_attrs(dset.attrs,attrs)
-          
         new_report = []
-        new_report.append("Apply an inverse Fourier transform.")
+        new_report.append("Compute the complex signal directly from the")
+        new_report.append("windowed signal's Fourier transform.")
+        
+        if bw is not None:
+            
+            if fc is None:
+                fc = freq[1 + np.argmax(np.abs(F[1:]))]
+            
+            bp = self._bandpass(freq, fc, bw, order, style)
+            
+            if bp is not None:
+                F *= bp
+            
+            new_report.append("Apply a bandpass filter with center frequency")
+            new_report.append("= {0:.6f} kHz,".format(fc))
+            new_report.append("bandwidth = {0:.3f} kHz,".format(bw))
+            new_report.append("and order = {0}.".format(order))
+        
+        # The negative frequencies are zeroed by the Hilbert filter
+        
+        Z = np.empty(n, self._dtypes()[1])
+        Z[:n_pos] = F
+        Z[n_pos:] = 0.0
+        
+        sIFT = _fft_lib.ifft(Z, workers=-1, overwrite_x=True, **_fft_kwargs)
+        
+        self._save_analytic(sIFT)
+        
         self.report.append(" ".join(new_report))
         
     def fit_phase(self, dt_chunk_target):
@@ -1098,8 +1354,9 @@ class Signal(object):
 
         # work out the chunking details
 
-        dt = self.f['x'].attrs['step']                # time per phase point
-        n = np.array(self.f['workup/time/p'][:]).size # no. of phase points
+        p_dset = self.f['workup/time/p']
+        dt = self.dt                # time per phase point
+        n = p_dset.shape[0]                           # no. of phase points
         
         n_per_chunk = int(round(dt_chunk_target/dt)) # points per chunck
         dt_chunk = dt*n_per_chunk                    # actual time per chunk
@@ -1126,25 +1383,28 @@ class Signal(object):
         # Reshape the phase data and 
         #  zero the phase at start of each chunk
         
-        y = np.array(self.f['workup/time/p'][0:n_total])        
+        y = p_dset[0:n_total]
         y_sub = y.reshape((n_tot_chunk,n_per_chunk))
-        y_sub_reset = y_sub - y_sub[:,:,np.newaxis][:,0,:]*np.ones(n_per_chunk)
+        y_sub_reset = y_sub - y_sub[:,:1]
 
-        # Reshape the time data
-        #  zero the time at start of each chunk
+        # The zeroed time in each chunk is k dt, k = 0 ... n-1, and the
+        #  chunks start every n_per_chunk points, so only the first time
+        #  point is needed from the time data
 
-        abscissa = self.f['workup/time/p'].attrs['abscissa']
-        x = np.array(self.f[abscissa])[0:n_total]
-        x_sub = x.reshape((n_tot_chunk,n_per_chunk))
-        x_sub_reset = x_sub - x_sub[:,:,np.newaxis][:,0,:]*np.ones(n_per_chunk)
+        abscissa = p_dset.attrs['abscissa']
+        x0 = float(self.f[abscissa][0])
+        x_start = x0 + dt*n_per_chunk*np.arange(n_tot_chunk)
 
         # use linear least-squares fitting formulas
-        #  to calculate the best-fit slope
+        #  to calculate the best-fit slope; S_xy = dt sum(k y_k) for all
+        #  the chunks at once is a single matrix-vector product
+
+        k = np.arange(n_per_chunk, dtype=y_sub_reset.dtype)
 
         SX = dt*0.50*(n_per_chunk-1)*(n_per_chunk)
         SXX = (dt)**2*(1/6.0)*(n_per_chunk)*(n_per_chunk-1)*(2*n_per_chunk-1)
         SY = np.sum(y_sub_reset,axis=1)
-        SXY = np.sum(x_sub_reset*y_sub_reset,axis=1)
+        SXY = dt*np.dot(y_sub_reset, k)
         slope = (n_per_chunk*SXY-SX*SY)/(n_per_chunk*SXX-SX*SX)
 
         stop = time.time()
@@ -1156,9 +1416,12 @@ class Signal(object):
         #
         #     old: x_sub[:,0]
         #     new: x_sub_middle = np.mean(x_sub[:,:],axis=1)
+        #
+        # The time points are equally spaced, so the mean is the chunk's
+        # start time plus half its duration; no need to average the array
 
-        x_sub_middle = np.mean(x_sub[:,:],axis=1)
-        dset = self.f.create_dataset('workup/fit/x',data=x_sub_middle)
+        x_sub_middle = x_start + 0.5*(n_per_chunk-1)*dt
+        dset = self._create_dataset('workup/fit/x',x_sub_middle)
         attrs = OrderedDict([
             ('name','t'),
             ('unit','s'),
@@ -1168,7 +1431,7 @@ class Signal(object):
             ])
         update_attrs(dset.attrs,attrs)
                   
-        dset = self.f.create_dataset('workup/fit/y',data=slope)
+        dset = self._create_dataset('workup/fit/y',slope)
         attrs = OrderedDict([
             ('name','f'),
             ('unit','cyc/s'),
@@ -1200,71 +1463,87 @@ class Signal(object):
         
         **Programming Notes**
         
-        * From the ``lmfit`` documentation [`link <http://newville.github.io/lmfit-py/fitting.html#fit_report>`__]:    
-          "Note that the calculation of chi-square and reduced chi-square assume
-          that the returned residual function is scaled properly to the
-          uncertainties in the data. For these statistics to be meaningful,
-          the person writing the function to be minimized must scale 
-          them properly."  
+        * The fit is done with ``scipy.optimize.curve_fit``, using the
+          analytic Jacobian of the model and the bounds :math:`a_0 \\geq 0`,
+          :math:`a_1 \\geq 0`.  The starting values are estimated from the
+          first and last data points.
+          
+        * The residuals are scaled by their standard deviation, as an estimate
+          of the standard error in each data point, so that the chi-square
+          statistics are meaningful.  A uniform error estimate changes neither
+          the best-fit parameters nor their (reduced chi-square scaled)
+          standard errors, so the data need not be refit with it.
             
             
         """
         
         # extract the data from the Datasets
         y_dset = self.f['workup/time/a']
-        x = np.array(self.f[y_dset.attrs['abscissa']][:])
-        y = np.array(y_dset[:])
-        
-        # define objective function: returns the array to be minimized
-        def fcn2min(params, x, y, y_stdev):
-            """ model decaying exponentil, subtract data"""
-            a0 = params['a0'].value
-            a1 = params['a1'].value
-            tau = params['tau'].value
-            y_calc = a0*np.exp(-x/tau) + a1
-            return (y_calc - y)/y_stdev
-
-        # create a set of Parameters
-        params = Parameters()
-        params.add('a0', value= 1.0,  min=0)
-        params.add('a1', value= 0.1,  min=0)
-        params.add('tau', value= 1.0)
-
-        # do fit once, here with leastsq model
-        y_stdev = np.ones(y.size)
-        result = minimize(fcn2min, params, args=(x,y,y_stdev))
-
-        # do fit again, using the standard deviation of the residuals
+        x = self.f[y_dset.attrs['abscissa']][:]
+        y = y_dset[:]
+        
+        # model decaying exponential and its Jacobian
+        def model(x, a0, a1, tau):
+            return a0*np.exp(-x/tau) + a1
+
+        def jac(x, a0, a1, tau):
+            e = np.exp(-x/tau)
+            return np.column_stack((e, np.ones_like(x), (a0/tau**2)*x*e))
+
+        # do the fit, starting from the baseline at the end of the data,
+        #  the decay above it at the start, and a decay time that is a
+        #  third of the record
+        a1_init = max(y[-1], 0.0)
+        p_init = [max(y[0] - a1_init, 0.0), a1_init, (x[-1] - x[0])/3.0]
+        popt, pcov, info, mesg, ier = optimize.curve_fit(model, x, y,
+            p0=p_init, jac=jac, bounds=([0, 0, -np.inf], np.inf),
+            full_output=True)
+
+        # use the standard deviation of the residuals
         #  as an estimate of the standard error in each data point
-        y_stdev = np.std(result.residual)*np.ones(y.size)
-        result = minimize(fcn2min, params, args=(x,y,y_stdev))
+        y_calc = model(x, *popt)
+        residual = y_calc - y
+        y_stdev = np.std(residual)
+        residual /= y_stdev
 
-        # calculate final result
-        y_calc = y + y_stdev*result.residual
+        names = ['a0', 'a1', 'tau']
+        p = {}
+        for k, name in enumerate(names):
+            p[name] = {'value': popt[k], 'stderr': np.sqrt(pcov[k,k])}
 
         # write error report
-        rep = fit_report(params)
+        chisqr = np.dot(residual, residual)
+        rep_lines = ["[[Fit Statistics]]",
+            "    # fitting method   = curve_fit (trf)",
+            "    # function evals   = {0}".format(info['nfev']),
+            "    # data points      = {0}".format(y.size),
+            "    # variables        = {0}".format(len(names)),
+            "    chi-square         = {0:.8g}".format(chisqr),
+            "    reduced chi-square = {0:.8g}".format(chisqr/(y.size - len(names))),
+            "[[Variables]]"]
+        for name, init in zip(names, p_init):
+            rep_lines.append("    {0:<4} {1:.8g} +/- {2:.8g} (init = {3:.8g})".format(
+                name + ':', p[name]['value'], p[name]['stderr'], init))
+        rep = "\n".join(rep_lines)
 
         # store fit results!
         # format string examples: http://mkaz.com/2012/10/10/python-string-format/
 
         dset = self.f.create_group('workup/fit/exp')
-        
-        p = result.params
 
         title = "a(t) = a0*exp(-t/tau) + a1" \
                 "\n" \
                 "a0 = {0:.6f} +/- {1:.6f}, tau = {2:.6f} +/- {3:.6f}, a1 = {4:.6f} +/- {5:.6f}".\
-                format(p['a0'].value, p['a0'].stderr,
-                        p['tau'].value, p['tau'].stderr,
-                        p['a1'].value, p['a1'].stderr)
+                format(p['a0']['value'], p['a0']['stderr'],
+                        p['tau']['value'], p['tau']['stderr'],
+                        p['a1']['value'], p['a1']['stderr'])
                    
         title_LaTeX = r'$a(t) = a_0 \exp(-t/\tau) + a_1$' \
                      '\n' \
                      r'$a_0 = {0:.6f} \pm {1:.6f}, \tau = {2:.6f} \pm {3:.6f}, a_1 = {4:.6f} \pm {5:.6f}$'. \
-                    format(p['a0'].value, p['a0'].stderr,
-                        p['tau'].value, p['tau'].stderr,
-                        p['a1'].value, p['a1'].stderr)
+                    format(p['a0']['value'], p['a0']['stderr'],
+                        p['tau']['value'], p['tau']['stderr'],
+                        p['a1']['value'], p['a1']['stderr'])
                 
         attrs = OrderedDict([
             ('abscissa', y_dset.attrs['abscissa']),
@@ -1273,16 +1552,16 @@ class Signal(object):
             ('help', 'fit to decaying exponential'),
             ('title', title),
             ('title_LaTeX', title_LaTeX),
-            ('tau', p['tau'].value),
-            ('tau_stderr', p['tau'].stderr),
-            ('a0', p['a0'].value),
-            ('a0_stderr', p['a0'].stderr), 
-            ('a1', p['a1'].value),
-            ('a1_stderr', p['a1'].stderr)         
+            ('tau', p['tau']['value']),
+            ('tau_stderr', p['tau']['stderr']),
+            ('a0', p['a0']['value']),
+            ('a0_stderr', p['a0']['stderr']), 
+            ('a1', p['a1']['value']),
+            ('a1_stderr', p['a1']['stderr'])         
             ])
         update_attrs(dset.attrs,attrs)
         
-        dset = self.f.create_dataset('workup/fit/exp/y_calc',data=y_calc)
+        dset = self._create_dataset('workup/fit/exp/y_calc',y_calc)
         a_unit = self.f['workup/time/a'].attrs['unit']
         attrs = OrderedDict([
             ('abscissa', y_dset.attrs['abscissa']), 
@@ -1294,7 +1573,7 @@ class Signal(object):
             ])
         update_attrs(dset.attrs,attrs)
                 
-        dset = self.f.create_dataset('workup/fit/exp/y_resid',data=result.residual) 
+        dset = self._create_dataset('workup/fit/exp/y_resid',residual) 
         attrs = OrderedDict([ 
             ('abscissa', y_dset.attrs['abscissa']),
             ('name', 'a (resid)'),
@@ -1314,6 +1593,8 @@ class Signal(object):
         # helpful
         # http://stackoverflow.com/questions/4209467/matplotlib-share-x-axis-but-dont-show-x-axis-tick-labels-for-both-just-one
         
+        import matplotlib.pyplot as plt
+        
         y_dset = self.f[fit_group].attrs['ordinate']
         x_dset = self.f[fit_group].attrs['abscissa']
         y_calc_dset = fit_group + '/y_calc'
@@ -1340,10 +1621,10 @@ class Signal(object):
             y2_label_string = self.f[y_resid_dset].attrs['label']
             title_string = self.f[fit_group].attrs['title']
 
-        y = np.array(self.f[y_dset][:])
-        y_calc = np.array(self.f[y_calc_dset][:])
-        y_resid = np.array(self.f[y_resid_dset][:])
-        x = np.array(self.f[x_dset][:])
+        y = self.f[y_dset][:]
+        y_calc = self.f[y_calc_dset][:]
+        y_resid = self.f[y_resid_dset][:]
+        x = self.f[x_dset][:]
 
         fig=plt.figure(facecolor='w')                
         
@@ -1405,6 +1686,204 @@ class Signal(object):
         print("===================")
         h5ls(self.f)
 
+    def _windowed_signal(self):
+        """Return the signal to be Fourier transformed: the points of y kept
+        by the binarate mask, if it is defined, times the cyclicizing window,
+        if it is defined.  The result is a new contiguous array, in single
+        precision if y is single precision and the Signal's precision is 
+        'float32', and in double precision otherwise."""
+
+        # If a mask is defined then select out a subset of the signal to be FT'ed
+        # The signal array, s, should be a fast FFT length at this point.
+        # The mask keeps a contiguous run of points, so read just that slab.
+
+        if self.f.__contains__('workup/time/mask/binarate') == True:
+
+            m = self.f['workup/time/mask/binarate']
+
+            if 'n_start' in m.attrs:
+                n_start = int(m.attrs['n_start'])
+                n_stop = int(m.attrs['n_stop'])
+            else:
+                kept = np.flatnonzero(m[:])
+                n_start, n_stop = int(kept[0]), int(kept[-1]) + 1
+
+        else:
+
+            n_start, n_stop = 0, self.n
+
+        # Hand the FFT a contiguous floating-point array so it does not
+        # make an internal copy.  At single precision, a single-precision
+        # signal stays single precision, so its FFT is too.  Read the signal
+        # straight into a new array; it is ours, so it is also safe to
+        # window in place.
+
+        y = self.f['y']
+        n = n_stop - n_start
+
+        if self._dtypes()[0] == np.float32 and \
+                y.dtype in (np.float32, np.complex64):
+            dtype = y.dtype
+        else:
+            dtype = np.result_type(y.dtype, np.float64)
+
+        s = np.empty(n, dtype)
+        y.read_direct(s, source_sel=np.s_[n_start:n_stop])
+
+        # If the cyclicizing window is defined then apply it to the signal.
+        # The window is 1.0 except for its rising and falling edges, so only
+        # the ww points at each end of the signal need to be multiplied.
+                                                      
+        if self.f.__contains__('workup/time/window/cyclicize') == True:
+            
+            w = self.f['workup/time/window/cyclicize']
+
+            if 'ww' in w.attrs:
+                ww = int(w.attrs['ww'])
+                s[:ww] *= w[:ww]
+                s[n-ww:] *= w[n-ww:]
+            else:
+                s = w[:]*s
+
+        return s
+
+    def _save_analytic(self, sIFT):
+        """Trim the complex signal sIFT with the rippleless mask, if it is
+        defined, and save it, its phase, and its amplitude in::
+
+            workup/time/z
+            workup/time/p
+            workup/time/a
+        """
+
+        # Trim if a rippleless masking array is defined
+        # Carefullly define what we should plot the complex
+        # FT-ed data against.
+        
+        if self.f.__contains__('workup/time/mask/rippleless') == True:
+            
+            # The mask keeps the contiguous points ww ... n - ww - 1, so
+            # slice them out rather than indexing with the boolean mask
+
+            m = self.f['workup/time/mask/rippleless']
+
+            if 'ww' in m.attrs:
+                ww = int(m.attrs['ww'])
+                sIFT = sIFT[ww:int(m.attrs['n_full'])-ww]
+            else:
+                sIFT = sIFT[m[:]]
+
+            abscissa = 'workup/time/x_rippleless'
+            
+        else:
+            
+            if self.f.__contains__('workup/time/mask/binarate') == True:
+                abscissa = '/workup/time/x_binarated'
+            else:
+                abscissa = 'x'
+        
+        dset = self._create_dataset('workup/time/z',sIFT)
+        unit_y = self._unit_y
+        attrs = OrderedDict([
+            ('name','z'),
+            ('unit',unit_y),
+            ('label','z [{0}]'.format(unit_y)),
+            ('label_latex','$z \: [\mathrm{{{0}}}]$'.format(unit_y)),
+            ('help','complex cantilever displacement'),
+            ('abscissa',abscissa)
+            ])
+        update_attrs(dset.attrs,attrs)         
+
+        # Compute and save the phase and amplitude
+        
+        p = unwrap(np.angle(sIFT))
+        p /= 2*np.pi
+        dset = self._create_dataset('workup/time/p',p)
+        attrs = OrderedDict([
+            ('name','phase'),
+            ('unit','cyc'),
+            ('label','phase [cyc]'),
+            ('label_latex','$\phi \: [\mathrm{cyc}]$'),
+            ('help','cantilever phase'),
+            ('abscissa',abscissa)
+            ])
+        update_attrs(dset.attrs,attrs)
+                  
+        a = np.abs(sIFT)
+        dset = self._create_dataset('workup/time/a',a)
+        attrs = OrderedDict([
+            ('name','amplitude'),
+            ('unit',unit_y),
+            ('label','a [{0}]'.format(unit_y)),
+            ('label_latex','$a \: [\mathrm{{{0}}}]$'.format(unit_y)),
+            ('help','cantilever amplitude'),
+            ('abscissa',abscissa)
+            ])
+        update_attrs(dset.attrs,attrs)
+
+    @property
+    def dt(self):
+        """The signal's time step [s]."""
+        return self._get_signal_attrs()[0]
+
+    @property
+    def n(self):
+        """The number of points in the signal."""
+        return self._get_signal_attrs()[1]
+
+    @property
+    def _unit_y(self):
+        return self._get_signal_attrs()[2]
+
+    def _get_signal_attrs(self):
+        """The signal's (dt, n, unit), looked up in the file the first time
+        they are needed, e.g. for a Signal opened from an existing file."""
+
+        if self.__dict__.get('_signal_attrs') is None:
+            self._cache_signal_attrs()
+
+        return self._signal_attrs
+
+    def _cache_signal_attrs(self):
+        """Keep the signal's time step ``dt``, number of points ``n``, and
+        unit on the Signal, so the workup steps need not look them up in
+        the file.  Called whenever the signal x, y is loaded."""
+
+        self._signal_attrs = (float(self.f['x'].attrs['step']),
+                              int(self.f['y'].shape[0]),
+                              self.f['y'].attrs['unit'])
+
+    def _dtypes(self):
+        """The (real, complex) dtypes for the Signal's precision."""
+
+        return _PRECISION_DTYPES[getattr(self, 'precision', 'float64')]
+
+    def _create_dataset(self, name, data):
+        """Create the dataset ``name`` containing ``data``.  If the file is
+        written to disk, store one-dimensional arrays in chunks of about
+        1 MiB, compressed with the shuffle and lzf filters; this keeps the
+        file small and makes reading part of a dataset cheap, at little cost
+        in write time.  Small datasets, and datasets in an in-memory file,
+        are stored contiguously, since there the filters would cost more
+        time than they save.  The exception is boolean masks: they are long
+        runs of one value, which lzf shrinks about a hundredfold for a
+        millisecond or two, so they are compressed in memory too."""
+
+        data = np.asarray(data)
+
+        in_memory = (self.f.driver == 'core' and
+                     not self.f.id.get_access_plist().get_fapl_core()[1])
+
+        if (in_memory and data.dtype != bool) or data.ndim != 1 or \
+                data.nbytes < _COMPRESS_MIN_BYTES:
+            return self.f.create_dataset(name, data=data)
+
+        chunk = max(1, (1 << 20)//data.dtype.itemsize)  # points per chunk
+
+        return self.f.create_dataset(name, data=data,
+                                     chunks=(min(chunk, data.size),),
+                                     compression='lzf', shuffle=True)
+
     def _load_hdf5_default(self, h5object, s_dataset='y', t_dataset='x',
                            infer_dt=True, infer_attrs=True):
         """Load an hdf5 file saved with default freqdemod attributes.
@@ -1437,6 +1916,8 @@ class Signal(object):
         check_minimum_attrs(x_attrs, 'freqdemod_x')
         check_minimum_attrs(y_attrs, 'freqdemod_y')
 
+        self._cache_signal_attrs()
+
     def _load_hdf5_general(self, h5object, s_dataset, s_name, s_unit,
                            t_dataset=None, dt=None,
                            s_help='cantilever displacement'):
@@ -1463,7 +1944,7 @@ class Signal(object):
             h5object.copy(t_dataset, self.f, name='x', without_attrs=True)
             dt_ = infer_timestep(h5object[t_dataset])
         elif dt is not None:
-            self.f['x'] = dt * np.arange(self.f['y'][:].size)
+            self._create_dataset('x', dt * np.arange(self.f['y'].size))
             dt_ = dt
         else:
             raise ValueError("Must specify one of 't_dataset' or 'dt'")
@@ -1477,8 +1958,82 @@ class Signal(object):
                    'step': dt_}
 
         update_attrs(self.f['x'].attrs, x_attrs)
+        self._cache_signal_attrs()
+
+# Points per block in _sine_exp; a block and its temporaries stay in cache
+
+_TESTSIGNAL_BLOCK = 8192
+
+# The test signals' noise generator, seeded once when the module is loaded
+
+_RNG = np.random.default_rng()
+
+@functools.lru_cache(maxsize=8)
+def _time_axis(nt, dt):
+    """The times dt*k, k = 0 ... nt - 1, as a read-only array shared by
+    the test signals."""
+
+    t = dt*np.arange(nt)
+    t.setflags(write=False)
+    return t
+
+@functools.lru_cache(maxsize=8)
+def _sine_exp(nt, dt, f0, sn, tau=None):
+    """The noise-free test signal sn*sin(2 pi f0 t)*exp(-t/tau) at the
+    times ``_time_axis(nt, dt)``; without the exponential decay if tau is
+    None.  The waveform is a read-only array, which is shared, so repeated
+    test signals differing only in their noise do not recompute it.  It is
+    evaluated block by block, in place, so each block of t is run through
+    all of the ufuncs while it is in cache."""
+
+    t = _time_axis(nt, dt)
+    s = np.empty(t.size)
+    omega = 2.0*np.pi*f0    # angular frequency [rad/s]
+
+    # The times are evenly spaced, so the decay over block i, starting at 
+    # t[i], is exp(-t[i]/tau) times the decay over the first block.  Take
+    # the exponential of the first block only, and scale it for the others.
+
+    if tau is not None:
+        e = np.multiply(t[:_TESTSIGNAL_BLOCK], -1.0/tau)
+        np.exp(e, out=e)
+
+    for i in range(0, t.size, _TESTSIGNAL_BLOCK):
+
+        tb = t[i:i+_TESTSIGNAL_BLOCK]
+        sb = s[i:i+_TESTSIGNAL_BLOCK]
+
+        np.multiply(tb, omega, out=sb)
+        np.sin(sb, out=sb)
+
+        if tau is not None:
+            sb *= e[:tb.size]
+            sb *= sn*math.exp(-t[i]/tau)
+        else:
+            sb *= sn
+
+    s.setflags(write=False)
+    return s
 
-def testsignal_sine():
+def _sine_exp_noise(nt, dt, f0, sn, sn_rms, tau=None, dtype=np.float64,
+                    rng=None):
+    """The test signal ``_sine_exp(nt, dt, f0, sn, tau)`` plus gaussian
+    noise of rms amplitude sn_rms, as a new array of type dtype (float64 or
+    float32).  The waveform is computed in double precision; the noise is
+    drawn directly in dtype, from rng: a numpy Generator or a seed for one,
+    or, if None, the module's generator."""
+
+    rng = _RNG if rng is None else np.random.default_rng(rng)
+    s = np.empty(int(nt), dtype=dtype)
+    rng.standard_normal(dtype=dtype, out=s)
+    s *= sn_rms
+    s += _sine_exp(nt, dt, f0, sn, tau)
+
+    return s
+
+def testsignal_sine(dtype=np.float64, rng=None):
+    """Create and work up a sine wave with noise.  Pass rng, a numpy Generator or an
+    integer seed, to draw reproducible noise."""
         
     fd = 50.0E3    # digitization frequency
     f0 = 2.00E3    # signal frequency
@@ -1487,10 +2042,9 @@ def testsignal_sine():
     sn_rms = 0.01  # noise rms amplitude
     
     dt = 1/fd
-    t = dt*np.arange(nt)
-    s = sn*np.sin(2*np.pi*f0*t) + np.random.normal(0,sn_rms,t.size)
+    s = _sine_exp_noise(nt, dt, f0, sn, sn_rms, dtype=dtype, rng=rng)
     
-    S = Signal()
+    S = Signal(precision=np.dtype(dtype).name)
     S.load_nparray(s,"x","nm",dt)
 
     S.time_mask_binarate("middle")
@@ -1518,7 +2072,7 @@ def testsignal_sine():
     S.list()
     return S
 
-def testsignal_sine_fm():
+def testsignal_sine_fm(dtype=np.float64):
     
     fd = 100E3         # digitization frequency
     f_start = 4.000E3  # starting frequency
@@ -1544,20 +2098,18 @@ def testsignal_sine_fm():
     
     f = np.append(np.append(f1,f2),f3)
     
-    # phase accumulator
+    # phase accumulator, p[k] = p[k-1] + dt*f[k-1], as a running sum
     
-    p = np.zeros(t.size)
+    p = np.empty(t.size)
     p[0] = 0.0
+    np.cumsum(dt*f[:-1], out=p[1:])
     
-    for k in np.arange(1,t.size):
-        p[k] = p[k-1] + dt*f[k-1]
-    
-    p = 2*np.pi*p
-    x = np.cos(p)
+    p *= 2*np.pi
+    x = np.cos(p, out=p).astype(dtype, copy=False)
 
     # make the single and work it up
 
-    S = Signal()
+    S = Signal(precision=np.dtype(dtype).name)
     S.load_nparray(x,"x","nm",dt)
 
     S.time_mask_binarate("middle")
@@ -1579,7 +2131,9 @@ def testsignal_sine_fm():
     print(S)
     return S
 
-def testsignal_sine_exp():
+def testsignal_sine_exp(dtype=np.float64, rng=None):
+    """Create and work up a noisy, exponentially decaying sine wave.  Pass rng, a numpy Generator or an
+    integer seed, to draw reproducible noise."""
     
     fd = 50.0E3    # digitization frequency [Hz]
     f0 = 2.00E3    # signal frequency [Hz]
@@ -1589,10 +2143,9 @@ def testsignal_sine_exp():
     sn_rms = 20.0   # noise rms amplitude [nm]
     
     dt = 1/fd
-    t = dt*np.arange(nt)
-    s = sn*np.sin(2*np.pi*f0*t)*np.exp(-t/tau) + np.random.normal(0,sn_rms,t.size)
+    s = _sine_exp_noise(nt, dt, f0, sn, sn_rms, tau, dtype, rng)
     
-    S = Signal('.temp_sine_exp.h5')
+    S = Signal('.temp_sine_exp.h5', precision=np.dtype(dtype).name)
     S.load_nparray(s,"x","nm",dt)
 
     S.time_mask_binarate("start")
@@ -1614,7 +2167,9 @@ def testsignal_sine_exp():
     print(S)
     return S
     
-def testsignal_sine_noise():
+def testsignal_sine_noise(dtype=np.float64, rng=None):
+    """Create and work up a noisy, decaying sine wave, and take its power spectrum.  Pass rng, a numpy Generator or an
+    integer seed, to draw reproducible noise."""
 
     fd = 50.0E3    # digitization frequency
     f0 = 2.00E3    # signal frequency
@@ -1624,10 +2179,9 @@ def testsignal_sine_noise():
     sn_rms = 0.1   # noise rms amplitude
     
     dt = 1/fd
-    t = dt*np.arange(nt)
-    s = sn*np.sin(2*np.pi*f0*t)*np.exp(-t/tau) + np.random.normal(0,sn_rms,t.size)
+    s = _sine_exp_noise(nt, dt, f0, sn, sn_rms, tau, dtype, rng)
     
-    S = Signal()
+    S = Signal(precision=np.dtype(dtype).name)
     S.load_nparray(s,"x","nm",dt)
 
     S.time_mask_binarate("middle")
@@ -1641,58 +2195,82 @@ def testsignal_sine_noise():
     S.list()
     return S
 
+# The test signals, by their command-line name
+
+_TESTSIGNALS = OrderedDict([
+    ('sine', testsignal_sine),
+    ('sinefm', testsignal_sine_fm),
+    ('sineexp', testsignal_sine_exp),
+    ('sinenoise', testsignal_sine_noise)
+    ])
+
 if __name__ == "__main__":
     
-    # Parge command-line arguments
+    # Parge command-line arguments.  The usual invocations, with only 
+    # --testsignal=<name> and --LaTeX or --no-LaTeX, are parsed by hand;
+    # anything else (e.g., --help or an unknown test signal) is handed to
+    # argparse, which is imported only then.
     # https://docs.python.org/2/library/argparse.html#module-argparse
     
-    import argparse
-    from argparse import RawTextHelpFormatter
+    import sys
+    import matplotlib.pyplot as plt
     
-    parser = argparse.ArgumentParser(formatter_class=RawTextHelpFormatter,
-        description="Determine a signal's frequency vs time.\n"
-        "Example usage:\n"
-        "    python demodulate.py --testsignal=sine --LaTeX\n\n")
-    parser.add_argument('--testsignal',
-        default='sine',
-        choices = ['sine', 'sinefm', 'sineexp', 'sinenoise'],
-        help='create and analyze a test signal')
-    parser.add_argument('--LaTeX',
-        dest='latex',
-        action='store_true',
-        help = 'use LaTeX plot labels')
-    parser.add_argument('--no-LaTeX',
-        dest='latex',
-        action='store_false',
-        help = 'do not use LaTeX plot labels (default)')
-    parser.set_defaults(latex=False)    
-    args = parser.parse_args()
+    testsignals = list(_TESTSIGNALS) + ['all']
     
-    # Set the default font and size for the figure
+    testsignal = 'sine'
+    latex = False
+    parsed = True
     
-    font = {'family' : 'serif',
-            'weight' : 'normal',
-            'size'   : 18}
-
-    plt.rc('font', **font)
-    plt.rcParams['figure.figsize'] =  8.31,5.32
+    for arg in sys.argv[1:]:
+        if arg.startswith('--testsignal=') and arg.split('=', 1)[1] in testsignals:
+            testsignal = arg.split('=', 1)[1]
+        elif arg == '--LaTeX':
+            latex = True
+        elif arg == '--no-LaTeX':
+            latex = False
+        else:
+            parsed = False
     
-    latex = args.latex
+    if not parsed:
+        
+        import argparse
+        from argparse import RawTextHelpFormatter
     
-    # Do one of the tests
+        parser = argparse.ArgumentParser(formatter_class=RawTextHelpFormatter,
+            description="Determine a signal's frequency vs time.\n"
+            "Example usage:\n"
+            "    python demodulate.py --testsignal=sine --LaTeX\n\n")
+        parser.add_argument('--testsignal',
+            default='sine',
+            choices = testsignals,
+            help='create and analyze a test signal (or all of them)')
+        parser.add_argument('--LaTeX',
+            dest='latex',
+            action='store_true',
+            help = 'use LaTeX plot labels')
+        parser.add_argument('--no-LaTeX',
+            dest='latex',
+            action='store_false',
+            help = 'do not use LaTeX plot labels (default)')
+        parser.set_defaults(latex=False)    
+        args = parser.parse_args()
+        
+        testsignal = args.testsignal
+        latex = args.latex
     
-    if args.testsignal == 'sine': 
-        S = testsignal_sine()
-
-    elif args.testsignal == 'sinefm': 
-        S = testsignal_sine_fm()        
-
-    elif args.testsignal == 'sineexp': 
-        S = testsignal_sine_exp()                            
-
-    elif args.testsignal == 'sinenoise': 
-        S = testsignal_sine_noise()    
-
-    else:
-        print("**warning **")
-        print("--testsignal={} not implimented yet".format(args.testsignal))
+    # Set the default font and size for the figures, for the tests only
+    
+    rc = {'font.family' : 'serif',
+          'font.weight' : 'normal',
+          'font.size'   : 18,
+          'figure.figsize' : (8.31,5.32)}
+    
+    # Do one of the tests, or all of them in one process, so that they 
+    # share the FFT plans and the cached test-signal time axes
+    
+    with plt.rc_context(rc):
+    
+        if testsignal == 'all':
+            S = [run() for run in _TESTSIGNALS.values()]
+        else:
+            S = _TESTSIGNALS[testsignal]()
@@ -17,9 +17,12 @@ Tests for the demodulate module.
 #
 
 from freqdemod.demodulate import Signal
+from freqdemod import demodulate
 from freqdemod.hdf5 import update_attrs
 from freqdemod.util import silent_remove
 from freqdemod.util import nearest2power
+from freqdemod.util import nearest_fast_len
+from freqdemod.util import unwrap
 import unittest
 import numpy as np
 from numpy.testing import assert_allclose, assert_array_equal
@@ -68,6 +71,27 @@ class TestClose(unittest.TestCase):
     def tearDown(self):
         silent_remove(self.filename)
 
+    def check_workup(self, s):
+        """The reopened signal's attributes are found and a workup step runs"""
+        
+        self.assertEqual(s.dt, 10E-6)
+        self.assertEqual(s.n, 3)
+        s.time_mask_binarate('middle')
+        self.assertTrue('workup/time/mask/binarate' in s.f)
+        s.f.close()
+
+    def test_reopen_init(self):
+        """A Signal constructed from an existing file can be worked up"""
+        
+        self.check_workup(Signal(self.filename, mode='r+', backing_store=True))
+
+    def test_reopen_open(self):
+        """A Signal opened from an existing file can be worked up"""
+        
+        s = Signal()
+        s.open(self.filename)
+        self.check_workup(s)
+
     def test_close(self):
         """Verify closed object by testing one of the attributes"""
         
@@ -132,6 +156,14 @@ class MaskTests(unittest.TestCase):
 
         self.assertEqual(np.count_nonzero(m),32*1024)   
  
+    def test_binarate_fast(self):
+        """Binarate mask middle, fast; 60000 = 2^5 3 5^4 is kept intact"""
+        
+        self.s.time_mask_binarate("middle", fast=True)
+        m = self.s.f['workup/time/mask/binarate']
+
+        self.assertEqual(np.count_nonzero(m),60000)
+
     def test_binarate_4(self):
         """If we have not called binarate, then workup/time/mask/binarate does not exist"""
         
@@ -193,6 +225,43 @@ class FFTTests(unittest.TestCase):
         
         self.assertTrue(np.allclose(filt,np.array([0, 1, 2])))
 
+    def test_psd_complex(self):
+        """FFT: the power spectrum of a complex signal is its f >= 0 half"""
+        
+        for nt in [4096, 4097]:
+            t = self.dt*np.arange(nt)
+            z = np.exp(2j*np.pi*5.00E3*t) + 0.1*np.exp(-2j*np.pi*3.00E3*t)
+            
+            S = Signal()
+            S.load_nparray(z,"x","nm",self.dt)
+            S.fft(psd=True)
+            
+            n_pos = (nt + 1)//2
+            psd = np.abs(np.fft.fft(z)[:n_pos])**2*self.dt/nt
+            assert_allclose(S.f['workup/freq/FT'][:], psd, 
+                            rtol=1e-10, atol=1e-12*psd.max())
+            assert_allclose(S.f['workup/freq/freq'][:], 
+                            np.fft.fftfreq(nt, self.dt)[:n_pos]/1E3)
+            S.close()
+        
+    def test_bp_cached(self):
+        """FFT: a bandpass filter reused from the cache matches a new one"""
+        
+        demodulate._bp_cache.clear()
+        self.s.freq_filter_bp(1.0)
+        bp_new = self.s.f['workup/freq/filter/bp'][:]
+        del self.s.f['workup/freq/filter/bp']
+        
+        self.s.freq_filter_bp(1.0)
+        assert_array_equal(self.s.f['workup/freq/filter/bp'][:], bp_new)
+        self.assertEqual(len(demodulate._bp_cache), 1)
+
+    def test_bp_order_zero(self):
+        """FFT: a zeroth-order brick wall filter is flat, 1/2"""
+        
+        self.s.freq_filter_bp(1.0, order=0)
+        assert_array_equal(self.s.f['workup/freq/filter/bp'][:], 0.5)
+
     def test_phase_fit_rounding(self):
         self.s.ifft()
         # T_chunk_goal set to cause problem due to incorrect rounding
@@ -207,6 +276,176 @@ class FFTTests(unittest.TestCase):
             pass                
 
 
+class AnalyticFastTests(unittest.TestCase):
+
+    def workup(self, fast, complex_signal=False):
+        """Analyze a phase-modulated sine wave, with or without the fast path"""
+        
+        fd = 50.0E3    # digitization frequency
+        f0 = 2.00E3    # signal frequency
+        nt = 60E3      # number of signal points
+        
+        dt = 1/fd
+        t = dt*np.arange(nt)
+        s = np.sin(2*np.pi*f0*t + 0.3*np.sin(2*np.pi*50*t))
+        if complex_signal:
+            s = s + 0.5j*np.cos(2*np.pi*f0*t)
+        
+        S = Signal()
+        S.load_nparray(s,"x","nm",dt)
+        S.time_mask_binarate("middle")
+        S.time_window_cyclicize(3E-3)
+        S.time_mask_rippleless(15E-3)
+        
+        if fast:
+            S.analytic_fast(bw=1.00)
+        else:
+            S.fft()
+            S.freq_filter_Hilbert_complex()
+            S.freq_filter_bp(1.00)
+            S.ifft()
+            
+        z = S.f['workup/time/z'][:]
+        abscissa = S.f['workup/time/z'].attrs['abscissa']
+        S.close()
+        return z, abscissa
+        
+    def test_analytic_fast(self):
+        """analytic_fast gives the same complex signal as fft ... ifft"""
+        
+        z_full, abscissa_full = self.workup(fast=False)
+        z_fast, abscissa_fast = self.workup(fast=True)
+        
+        self.assertEqual(abscissa_fast, abscissa_full)
+        assert_allclose(z_fast, z_full, rtol=0, atol=1e-12)
+        
+    def test_analytic_fast_complex(self):
+        """analytic_fast handles a complex signal like fft ... ifft"""
+        
+        z_full, abscissa_full = self.workup(fast=False, complex_signal=True)
+        z_fast, abscissa_fast = self.workup(fast=True, complex_signal=True)
+        
+        assert_allclose(z_fast, z_full, rtol=0, atol=1e-12)
+
+
+class PrecisionTests(unittest.TestCase):
+
+    def workup(self, precision):
+        """Demodulate a sine wave at the given precision"""
+        
+        fd = 50.0E3    # digitization frequency
+        f0 = 2.00E3    # signal frequency
+        nt = 60E3      # number of signal points
+        
+        dt = 1/fd
+        t = dt*np.arange(nt)
+        s = np.sin(2*np.pi*f0*t)
+        
+        S = Signal(precision=precision)
+        S.load_nparray(s,"x","nm",dt)
+        S.time_mask_binarate("middle")
+        S.time_window_cyclicize(3E-3)
+        S.fft()
+        S.freq_filter_Hilbert_complex()
+        S.freq_filter_bp(1.00)
+        S.time_mask_rippleless(15E-3)
+        S.ifft()
+        
+        dtypes = [S.f[name].dtype for name in 
+                  ['workup/freq/filter/Hc', 'workup/freq/filter/bp',
+                   'workup/time/z', 'workup/time/a']]
+        p = S.f['workup/time/p'][:]
+        S.close()
+        return dtypes, p
+        
+    def test_float32(self):
+        """Single precision filters and results, with the same phase"""
+        
+        dtypes, p = self.workup('float32')
+        dtypes_64, p_64 = self.workup('float64')
+        
+        self.assertEqual(dtypes, [np.float32, np.float32, np.complex64, np.float32])
+        self.assertEqual(dtypes_64, [np.float64, np.float64, np.complex128, np.float64])
+        assert_allclose(p, p_64, rtol=0, atol=1e-5)
+        
+    def test_float32_signal(self):
+        """A single-precision signal has a single-precision FT only at
+        single precision"""
+        
+        fd = 50.0E3
+        dt = 1/fd
+        t = dt*np.arange(60E3)
+        s = np.sin(2*np.pi*2.00E3*t)
+        
+        FT = {}
+        for dtype, precision in [(np.float64, 'float64'), 
+                                 (np.float32, 'float64'),
+                                 (np.float32, 'float32')]:
+            S = Signal(precision=precision)
+            S.load_nparray(s.astype(dtype),"x","nm",dt)
+            S.time_mask_binarate("middle")
+            S.time_window_cyclicize(3E-3)
+            S.fft()
+            FT[precision, dtype] = S.f['workup/freq/FT'][:]
+            S.close()
+        
+        FT_64 = FT['float64', np.float64]
+        self.assertEqual(FT['float64', np.float32].dtype, np.complex128)
+        self.assertEqual(FT['float32', np.float32].dtype, np.complex64)
+        assert_allclose(FT['float32', np.float32], FT_64, rtol=0, 
+                        atol=1e-5*np.abs(FT_64).max())
+        
+    def test_testsignal_seed(self):
+        """Test-signal noise drawn with a seed is reproducible"""
+        
+        args = (1000, 2E-5, 2.00E3, 1.0, 0.1, 0.325)
+        s1 = demodulate._sine_exp_noise(*args, rng=42)
+        s2 = demodulate._sine_exp_noise(*args, rng=np.random.default_rng(42))
+        s3 = demodulate._sine_exp_noise(*args)
+        
+        assert_array_equal(s1, s2)
+        self.assertFalse(np.array_equal(s1, s3))
+        
+    def test_bad_precision(self):
+        """An unknown precision is an error"""
+        
+        self.assertRaises(ValueError, Signal, precision='float16')
+
+
+class FitAmplitudeTests(unittest.TestCase):
+
+    def setUp(self):
+        """A noise-free sine wave decaying to an offset"""
+        
+        fd = 50.0E3    # digitization frequency
+        f0 = 2.00E3    # signal frequency
+        self.tau = 0.1 # decay time
+        nt = 2**14     # number of signal points
+        
+        dt = 1/fd
+        t = dt*np.arange(nt)
+        s = (np.exp(-t/self.tau) + 0.2)*np.sin(2*np.pi*f0*t)
+        
+        self.s = Signal()
+        self.s.load_nparray(s,"x","nm",dt)
+        self.s.fft()
+        self.s.freq_filter_Hilbert_complex()
+        self.s.freq_filter_bp(1.00)
+        self.s.time_mask_rippleless(10E-3)
+        self.s.ifft()
+        
+    def test_fit_amplitude(self):
+        """Fit amplitude: recover the decay time and offset"""
+        
+        self.s.fit_amplitude()
+        attrs = self.s.f['workup/fit/exp'].attrs
+        assert_allclose(attrs['tau'], self.tau, rtol=1e-3)
+        assert_allclose(attrs['a1'], 0.2, rtol=1e-2)
+        
+    def tearDown(self):
+        self.s.close()
+
+
 class FFTOddPoints(unittest.TestCase):
     def setUp(self):
         self.x = np.array([0, 1, 0, -1, 0, 1, 0, -1, 0])
@@ -429,4 +668,18 @@ class MiscTests(unittest.TestCase):
 class UtilTests(unittest.TestCase):
 
     def test_nearest2power(self):
-        self.assertEqual(nearest2power(1025), 1024) 
\ No newline at end of file
+        self.assertEqual(nearest2power(1025), 1024)
+
+    def test_nearest_fast_len(self):
+        self.assertEqual(nearest_fast_len(1025), 1024)
+        self.assertEqual(nearest_fast_len(1100), 1080)
+        self.assertEqual(nearest_fast_len(60001), 60000) 
+
+    def test_unwrap(self):
+        """Agrees with np.unwrap, including steps of odd multiples of pi"""
+        p = np.angle(np.exp(1j*np.linspace(0, 40*np.pi, 1001)))
+        assert_allclose(unwrap(p), np.unwrap(p), atol=1e-12)
+        q = np.array([0, np.pi, 0, -np.pi, 3.0, -3.0])
+        assert_array_equal(unwrap(q), np.unwrap(q))
+        q = np.array([0, 3*np.pi, 0, -5*np.pi, 2*np.pi, 9.0, -20.0])
+        assert_allclose(unwrap(q), np.unwrap(q), atol=1e-12)
\ No newline at end of file
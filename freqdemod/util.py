@@ -61,6 +61,46 @@ def nearest2power(x):
     """Nearest power of 2 to x, rounded down."""
     return int(math.pow(2,int(math.floor(math.log(x, 2)))))
 
+def nearest_fast_len(x):
+    """Nearest 5-smooth number, :math:`2^a 3^b 5^c`, to x, rounded down.
+    A real FFT of this length is about as fast as a power-of-two FFT."""
+    x = int(x)
+    best = 1
+    p5 = 1
+    while p5 <= x:
+        p35 = p5
+        while p35 <= x:
+            # largest power of two that fits in the remaining factor
+            p2 = 1 << ((x // p35).bit_length() - 1)
+            best = max(best, p35*p2)
+            p35 = 3*p35
+        p5 = 5*p5
+    return best
+
+def unwrap(p):
+    """Unwrap the phase array p [rad], like ``np.unwrap`` for a 1-D array.
+    The number of 2 pi jumps is tracked as an integer count, so each
+    unwrapped point is p[i] + 2 pi k[i] with a single rounding, rather than
+    a running floating-point sum of corrections."""
+    p = np.asarray(p, dtype=float)
+    k = np.empty(p.shape, dtype=np.int64)
+    if p.size == 0:
+        return p.copy()
+    k[0] = 0
+    # remove m 2 pi jumps from each step d, leaving it in [-pi, pi), with
+    # m = floor((d + pi)/(2 pi)); as np.unwrap does, a positive step of 
+    # exactly an odd multiple of pi is left at +pi rather than -pi
+    d = np.diff(p)
+    d += np.pi
+    d /= 2*np.pi
+    m = np.floor(d)
+    m[(m == d) & (m > 0)] -= 1
+    np.cumsum(-m.astype(np.int64), out=k[1:])
+    out = k*(2*np.pi)
+    out += p
+    return out
+
+
 
 def find_nearest(array, value, verbose=False):
     """The nearest value in a numpy array."""
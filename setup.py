@@ -39,6 +39,7 @@ setup(name='FreqDemod',
       url='https://github.com/JohnMarohn/FreqDemod',
       packages=find_packages(),
       install_requires=install_requires,
+      extras_require={'fftw': ['pyFFTW >= 0.13.0']},
       setup_requires=["setuptools_git >= 0.3"],
       tests_require=[],
       zip_safe=False,